@@ -8,14 +8,18 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from utils.plotting import *
+from utils.outliers import detect_outliers, AUDIO_FEATURES
+from utils.profiling import profiler
 
 warnings.filterwarnings('ignore')
 sns.set(style="whitegrid")
 
 # load datasets from CSV to pandas df
 # artsists is delimited using ; so use sep=','
-artists = pd.read_csv("../original_datasets/artists.csv", sep=';')
-tracks = pd.read_csv("../original_datasets/tracks.csv")
+with profiler.stage('load') as stage:
+    artists = pd.read_csv("../original_datasets/artists.csv", sep=';')
+    tracks = pd.read_csv("../original_datasets/tracks.csv")
+    stage['rows_out'] = len(tracks)
 
 ## Datasets shape
 artists_shape = artists.shape
@@ -40,19 +44,21 @@ tracks.head()
 plot_nans_stacked(artists, 'NaN Percentage Per Column (Artists Dataset)')
 
 ## Let's import augmented data from our search, we manually searched the result and saved the url in the last column for easy reference
-artists_search = pd.read_csv("../original_datasets/artists_missing_vals.csv")
-artists_search.head()
+with profiler.stage('merge', rows_in=len(artists)) as stage:
+    artists_search = pd.read_csv("../original_datasets/artists_missing_vals.csv")
+    artists_search.head()
 
-updated_ids = artists_search['id_author'].unique()
+    updated_ids = artists_search['id_author'].unique()
 
-# remove rows from the original artists dataframe
-artists_without_updates = artists[~artists['id_author'].isin(updated_ids)]
+    # remove rows from the original artists dataframe
+    artists_without_updates = artists[~artists['id_author'].isin(updated_ids)]
 
-# concatenate the remaining original data with the updated data
-artists_final = pd.concat([artists_search, artists_without_updates], ignore_index=True)
+    # concatenate the remaining original data with the updated data
+    artists_final = pd.concat([artists_search, artists_without_updates], ignore_index=True)
 
-# save to csv
-artists_final.to_csv("../enriched_datasets/artists.csv", index=False)
+    # save to csv
+    artists_final.to_csv("../enriched_datasets/artists.csv", index=False)
+    stage['rows_out'] = len(artists_final)
 
 # Verify the result
 print(f"Original artists: {len(artists)} rows")
@@ -76,14 +82,15 @@ artists.head()
 artists.columns
 
 # these columns are strings from what we can see from the dataset by using artists.head()
-columns_to_string   = ["id_author", "name", "gender", "birth_place", "nationality", "description", "province", "region", "country"]
-for column in columns_to_string:
-    artists[column] = artists[column].astype('string')
+with profiler.stage('cast_artists', rows_in=len(artists)):
+    columns_to_string   = ["id_author", "name", "gender", "birth_place", "nationality", "description", "province", "region", "country"]
+    for column in columns_to_string:
+        artists[column] = artists[column].astype('string')
     
-# these columns need to be converted to datetime, the native pandas date type
-columns_to_datetime = ["birth_date", "active_start", "active_end"]
-for column in columns_to_datetime:
-    artists[column] = pd.to_datetime(artists[column], errors='coerce')
+    # these columns need to be converted to datetime, the native pandas date type
+    columns_to_datetime = ["birth_date", "active_start", "active_end"]
+    for column in columns_to_datetime:
+        artists[column] = pd.to_datetime(artists[column], errors='coerce')
 
 # latitude and longitude are already float 64, so no casting is needed
 
@@ -92,53 +99,55 @@ for column in columns_to_datetime:
 tracks.info()
 tracks.head()
 
-columns_to_string   = ["id", "id_artist", "name_artist", "full_title", "title", "featured_artists", "primary_artist", "language", "album", "album_name", "album_type", "lyrics", "album_image", "id_album"]
-for column in columns_to_string:
-    tracks[column] = tracks[column].astype('string')
+with profiler.stage('cast_tracks', rows_in=len(tracks)):
+    columns_to_string   = ["id", "id_artist", "name_artist", "full_title", "title", "featured_artists", "primary_artist", "language", "album", "album_name", "album_type", "lyrics", "album_image", "id_album"]
+    for column in columns_to_string:
+        tracks[column] = tracks[column].astype('string')
     
-# these columns are array of strings, let's leave them as objects
-columns_to_array = ["swear_IT_words", "swear_EN_words"]
+    # these columns are array of strings, let's leave them as objects
+    columns_to_array = ["swear_IT_words", "swear_EN_words"]
 
-# to datetime
-tracks['album_release_date'] = pd.to_datetime(tracks['album_release_date'], errors='coerce')
-tracks['popularity'] = tracks['popularity'].apply(pd.to_numeric, errors='coerce')
-tracks['popularity'] = tracks['popularity'].astype('Int64')
+    # to datetime
+    tracks['album_release_date'] = pd.to_datetime(tracks['album_release_date'], errors='coerce')
+    tracks['popularity'] = tracks['popularity'].apply(pd.to_numeric, errors='coerce')
+    tracks['popularity'] = tracks['popularity'].astype('Int64')
 
-# from df.info we can see that this column is a boolean, so let's cast it to bool
-tracks['explicit'] = tracks['explicit'].astype('bool')
+    # from df.info we can see that this column is a boolean, so let's cast it to bool
+    tracks['explicit'] = tracks['explicit'].astype('bool')
 
-# different values, like NaN or 2021.0 so cast to int
-tracks['year'] = tracks['year'].apply(pd.to_numeric, errors='coerce')
-tracks["year"] = tracks['year'].astype('Int64')
+    # different values, like NaN or 2021.0 so cast to int
+    tracks['year'] = tracks['year'].apply(pd.to_numeric, errors='coerce')
+    tracks["year"] = tracks['year'].astype('Int64')
 
 ###################
 ## Duplicate analysis
 
-# Tracks
-tracks_duplicates = tracks.duplicated().sum()
-print(f"Duplicates in tracks: {tracks_duplicates}")
+with profiler.stage('dedup', rows_in=len(tracks)):
+    # Tracks
+    tracks_duplicates = tracks.duplicated().sum()
+    print(f"Duplicates in tracks: {tracks_duplicates}")
 
-# Check for duplicate track IDs
-tracks_id_duplicates = tracks['id'].duplicated().sum()
-print(f"Duplicate track ID: {tracks_id_duplicates}")
+    # Check for duplicate track IDs
+    tracks_id_duplicates = tracks['id'].duplicated().sum()
+    print(f"Duplicate track ID: {tracks_id_duplicates}")
 
-duplicate_tracks = tracks[tracks['id'].duplicated()]
-dup_ids = tracks['id'][tracks['id'].duplicated(keep=False)].unique()
+    duplicate_tracks = tracks[tracks['id'].duplicated()]
+    dup_ids = tracks['id'][tracks['id'].duplicated(keep=False)].unique()
 
-tracks[tracks["id"].isin(dup_ids)]
+    tracks[tracks["id"].isin(dup_ids)]
 
-if 'title' in tracks.columns and 'primary_artist' in tracks.columns:
-    tracks_content_duplicates = tracks.duplicated(subset=['title', 'primary_artist']).sum()
+    if 'title' in tracks.columns and 'primary_artist' in tracks.columns:
+        tracks_content_duplicates = tracks.duplicated(subset=['title', 'primary_artist']).sum()
     
-    print(f"Number of songs with same title and artist: {tracks_content_duplicates}")
-    tracks[tracks.duplicated(subset=['title', 'primary_artist'])]
+        print(f"Number of songs with same title and artist: {tracks_content_duplicates}")
+        tracks[tracks.duplicated(subset=['title', 'primary_artist'])]
 
-# Artists
-artists_duplicates = artists.duplicated().sum()
-print(f"Duplicate rows in artists: {artists_duplicates}")
+    # Artists
+    artists_duplicates = artists.duplicated().sum()
+    print(f"Duplicate rows in artists: {artists_duplicates}")
 
-artists_id_duplicates = artists['id_author'].duplicated().sum()
-print(f"Duplicate artist IDs: {artists_id_duplicates}")
+    artists_id_duplicates = artists['id_author'].duplicated().sum()
+    print(f"Duplicate artist IDs: {artists_id_duplicates}")
 
 ###################
 # Variable distribution analysis
@@ -179,18 +188,19 @@ print(f"English swear words [Max - Mean]: [{tracks['swear_EN'].max()} - {tracks[
 # We can see that there are some odd values for popularity to explore, minimum value seems odd, same for max value which is very high, let's plot a distribution of popularity values
 # we can observe that around 3x more italian swear words are used compared to english, this was expected as we are analyzing italian rap
 # additionally we can see a low usage of swear words
-plot_scatter(tracks, 'swear_IT', 'popularity', 'Swear Words', 'Popularity', 'Birth Year vs Career Start')
-
-plt.figure(figsize=(12, 6))
-plt.scatter(tracks['swear_IT'], tracks['popularity'], label='IT Swear Words')
-plt.scatter(tracks['swear_EN'], tracks['popularity'], label='EN Swear Words')
-plt.xlabel('Num Swear Words', fontsize=12)
-plt.ylabel('Popularity', fontsize=12)
-plt.title('Swear Words vs Track Popularity', fontsize=14, fontweight='bold')
-plt.legend(fontsize=11)
-plt.grid(True, alpha=0.3)
-plt.tight_layout()
-plt.show()
+plot_scatter(tracks, 'swear_IT', 'popularity', 'Swear Words', 'Popularity', 'Italian Swear Words vs Popularity')
+
+with profiler.stage('plot_swear_words_vs_popularity', rows_in=len(tracks)):
+    plt.figure(figsize=(12, 6))
+    plt.scatter(tracks['swear_IT'], tracks['popularity'], label='IT Swear Words')
+    plt.scatter(tracks['swear_EN'], tracks['popularity'], label='EN Swear Words')
+    plt.xlabel('Num Swear Words', fontsize=12)
+    plt.ylabel('Popularity', fontsize=12)
+    plt.title('Swear Words vs Track Popularity', fontsize=14, fontweight='bold')
+    plt.legend(fontsize=11)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.show()
 
 # We can see the map which resembles italy, partially
 plot_scatter(artists, 'longitude', 'latitude', 'Longitude', 'Latitude', 'Geographic Distribution of Birth Places')
@@ -206,3 +216,30 @@ plot_histogram(artists, 'age_at_start', 'Age At Carrer Start', 'Authors Count',
 print(f"Mean age at start: {artists['age_at_start'].mean():.2f}")
 print(f"Median age at start: {artists['age_at_start'].median():.2f}")
 print(f"Std dev: {artists['age_at_start'].std():.2f}")
+
+###################
+## Outliers and anomalies
+# vectorized robust z-score and IQR rules, both on the whole column and per artist, plus domain checks
+# the result is a boolean flag matrix aligned with the tracks index, one column per (feature, rule)
+with profiler.stage('outliers_tracks', rows_in=len(tracks)):
+    tracks_numeric_cols = ['popularity', 'swear_IT', 'swear_EN', 'n_tokens', 'n_sentences']
+    tracks_outliers = detect_outliers(tracks, tracks_numeric_cols, group='id_artist',
+                                      bounds={'popularity': (0, 100), 'swear_IT': (0, None), 'swear_EN': (0, None)},
+                                      multivariate_columns=AUDIO_FEATURES)
+print(f"Tracks flagged by each rule:\n{tracks_outliers.sum()}")
+print(f"Tracks with at least one flag: {tracks_outliers.any(axis=1).sum()}")
+
+# inspect the tracks flagged by the multivariate detector on the audio features
+tracks[tracks_outliers['mahalanobis']].head()
+
+# a career can't start before birth, and we consider a start before 10 or after 80 years old as impossible
+with profiler.stage('outliers_artists', rows_in=len(artists)):
+    artists_outliers = detect_outliers(artists, ['age_at_start', 'birth_year'],
+                                       bounds={'age_at_start': (10, 80)})
+print(f"Artists flagged by each rule:\n{artists_outliers.sum()}")
+artists[artists_outliers['age_at_start_range']][['name', 'birth_date', 'active_start', 'age_at_start']]
+
+###################
+## Run summary
+# wall/CPU time, peak memory and row counts of each stage, run with PROFILE_DIR=<dir> to also get a cProfile trace per stage
+profiler.dump("../profiling/data_understanding_run.json")
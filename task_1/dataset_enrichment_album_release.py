@@ -4,6 +4,11 @@ from tqdm import tqdm
 import time
 from dotenv import load_dotenv
 import os
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.profiling import profiler
 
 
 """
@@ -29,7 +34,9 @@ def get_spotify_token(client_id, client_secret):
     url = "https://accounts.spotify.com/api/token"
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
     data = {"grant_type": "client_credentials"}
+    start = time.perf_counter()
     r = requests.post(url, headers=headers, data=data, auth=(client_id, client_secret))
+    profiler.record_request("get_spotify_token", time.perf_counter() - start, r.status_code)
     r.raise_for_status()
     return r.json()["access_token"]
 
@@ -42,7 +49,9 @@ def search_track(title, artist, token):
     query = f"track:{title} artist:{artist}"
     url = f"https://api.spotify.com/v1/search?q={requests.utils.quote(query)}&type=track&limit=1"
     headers = {"Authorization": f"Bearer {token}"}
+    start = time.perf_counter()
     r = requests.get(url, headers=headers)
+    profiler.record_request("search_track", time.perf_counter() - start, r.status_code)
     if r.status_code != 200:
         return None
     items = r.json().get("tracks", {}).get("items", [])
@@ -56,7 +65,9 @@ def search_track(title, artist, token):
 
 
 def enrich_dataset(input_csv, output_csv, client_id, client_secret):
-    df = pd.read_csv(input_csv)
+    with profiler.stage("load") as stage:
+        df = pd.read_csv(input_csv)
+        stage["rows_out"] = len(df)
     token = get_spotify_token(client_id, client_secret)
 
     # Creates new colums if missing
@@ -65,22 +76,27 @@ def enrich_dataset(input_csv, output_csv, client_id, client_secret):
             df[col] = None
 
     print(f"🔍 Enrichment of {len(df)} tracks loading...\n")
-    for idx, row in tqdm(df.iterrows(), total=len(df)):
-        title = str(row.get("title", "")).strip()
-        artist = str(row.get("primary_artist", "")).strip()
-        if not title or not artist:
-            continue
-
-        result = search_track(title, artist, token)
-        if result:
-            df.loc[idx, "album_release_date"] = result["album_release_date"]
-            df.loc[idx, "popularity"] = result["popularity"]
-
-        time.sleep(0.2)  # API rate limit: 10 rps
-
-    df.to_csv(output_csv, index=False)
+    with profiler.stage("enrich", rows_in=len(df)):
+        for idx, row in tqdm(df.iterrows(), total=len(df)):
+            title = str(row.get("title", "")).strip()
+            artist = str(row.get("primary_artist", "")).strip()
+            if not title or not artist:
+                continue
+
+            result = search_track(title, artist, token)
+            if result:
+                df.loc[idx, "album_release_date"] = result["album_release_date"]
+                df.loc[idx, "popularity"] = result["popularity"]
+
+            time.sleep(0.2)  # API rate limit: 10 rps
+
+    with profiler.stage("save", rows_in=len(df)):
+        df.to_csv(output_csv, index=False)
     print(f"\n✅ Enrichment file saved as: {output_csv}")
 
+    # Wall/CPU time of each stage plus latency histogram, status and retry/429 counts of the API calls
+    profiler.dump(f"../profiling/{Path(__file__).stem}_run.json")
+
 if __name__ == "__main__":
     enrich_dataset(INPUT_CSV, OUTPUT_CSV, SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
 
@@ -4,6 +4,11 @@ from tqdm import tqdm
 import time
 from dotenv import load_dotenv
 import os
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.profiling import profiler
 
 
 """
@@ -29,7 +34,9 @@ def get_spotify_token(client_id, client_secret):
     url = "https://accounts.spotify.com/api/token"
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
     data = {"grant_type": "client_credentials"}
+    start = time.perf_counter()
     r = requests.post(url, headers=headers, data=data, auth=(client_id, client_secret))
+    profiler.record_request("get_spotify_token", time.perf_counter() - start, r.status_code)
     r.raise_for_status()
     return r.json()["access_token"]
 
@@ -48,21 +55,34 @@ def search_track(title, artist, token):
     retry_delay = 1
     
     for attempt in range(max_retries):
+        start = time.perf_counter()
         try:
             r = requests.get(url, headers=headers, timeout=10)
-            if r.status_code == 401:  # Token expired
-                return "token_expired"
-            if r.status_code != 200:
-                print(f"\nWarning: API returned status {r.status_code} for track '{title}' by {artist}")
-                return None
-            items = r.json().get("tracks", {}).get("items", [])
-            break
         except requests.exceptions.RequestException as e:
+            r, error = None, e
+        # every attempt is recorded once, status None for timeouts and network errors
+        profiler.record_request("search_track", time.perf_counter() - start,
+                                r.status_code if r is not None else None, retries=min(attempt, 1))
+
+        if r is None:
             if attempt == max_retries - 1:
-                print(f"\nError: Failed to fetch data for track '{title}' by {artist}: {str(e)}")
+                print(f"\nError: Failed to fetch data for track '{title}' by {artist}: {str(error)}")
                 return None
             time.sleep(retry_delay)
             retry_delay *= 2  # Exponential backoff
+            continue
+
+        if r.status_code == 401:  # Token expired
+            return "token_expired"
+        if r.status_code != 200:
+            print(f"\nWarning: API returned status {r.status_code} for track '{title}' by {artist}")
+            return None
+        try:
+            items = r.json().get("tracks", {}).get("items", [])
+        except requests.exceptions.JSONDecodeError:
+            print(f"\nWarning: invalid JSON response for track '{title}' by {artist}")
+            return None
+        break
     if not items:
         return None
     
@@ -85,32 +105,39 @@ def search_track(title, artist, token):
 
 
 def enrich_dataset(input_csv, output_csv, client_id, client_secret):
-    df = pd.read_csv(input_csv)
+    with profiler.stage("load") as stage:
+        df = pd.read_csv(input_csv)
+        stage["rows_out"] = len(df)
     token = get_spotify_token(client_id, client_secret)
     
     print("🔍 Searching for track release dates...")
-    progress_bar = tqdm(df.index, total=len(df))
-    for idx in progress_bar:
-        title = df.at[idx, 'title']
-        artist = df.at[idx, 'name_artist']
+    with profiler.stage("enrich", rows_in=len(df)):
+        progress_bar = tqdm(df.index, total=len(df))
+        for idx in progress_bar:
+            title = df.at[idx, 'title']
+            artist = df.at[idx, 'name_artist']
         
-        result = search_track(title, artist, token)
-        if result == "token_expired":
-            print("\nRefreshing Spotify API token...")
-            token = get_spotify_token(client_id, client_secret)
             result = search_track(title, artist, token)
+            if result == "token_expired":
+                print("\nRefreshing Spotify API token...")
+                token = get_spotify_token(client_id, client_secret)
+                result = search_track(title, artist, token)
         
-        if isinstance(result, dict):
-            df.at[idx, 'year'] = result['year']
-            df.at[idx, 'month'] = result['month']
-            df.at[idx, 'day'] = result['day']
+            if isinstance(result, dict):
+                df.at[idx, 'year'] = result['year']
+                df.at[idx, 'month'] = result['month']
+                df.at[idx, 'day'] = result['day']
         
-        progress_bar.set_description(f"Processing {title[:30]}...")
-        time.sleep(0.2)  # API rate limit: 10 rps
+            progress_bar.set_description(f"Processing {title[:30]}...")
+            time.sleep(0.2)  # API rate limit: 10 rps
 
-    df.to_csv(output_csv, index=False)
+    with profiler.stage("save", rows_in=len(df)):
+        df.to_csv(output_csv, index=False)
     print(f"\n✅ Enrichment file saved as: {output_csv}")
 
+    # Wall/CPU time of each stage plus latency histogram, status and retry/429 counts of the API calls
+    profiler.dump(f"../profiling/{Path(__file__).stem}_run.json")
+
 if __name__ == "__main__":
     enrich_dataset(INPUT_CSV, OUTPUT_CSV, SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
 
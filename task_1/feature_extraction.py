@@ -1,14 +1,39 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.feature_matrix import export_feature_matrix
+from utils.profiling import profiler
+
+
+"""
+    Feature matrix export for the modeling tasks.
+    - EXPORT_FEATURE_MATRIX -> enables the float32 memmap export
+    - EXPORT_STANDARDIZE -> z-scores the exported columns
+    - EXPORT_FEATURES -> original and new features written to the matrix
+"""
+EXPORT_FEATURE_MATRIX = False
+EXPORT_STANDARDIZE = True
+EXPORT_PATH = "../enriched_datasets/tracks_features.npy"
+EXPORT_FEATURES = [
+    "popularity", "swear_IT", "swear_EN", "n_tokens", "tokens_per_sent", "avg_token_per_clause",
+    "rms", "loudness", "flux", "zcr", "centroid", "rolloff", "flatness", "spectral_complexity", "pitch", "bpm",
+    "swear_ratio", "syntactic_complexity", "energy_index", "timbre_brightness", "noise_ratio",
+    "rythmic_complexity", "relative_popularity",
+]
 
 
 
 """
     Opening .csv file using Pandas df.
 """
-tracks = pd.read_csv("../enriched_datasets/tracks_enriched.csv")
-artists = pd.read_csv("../enriched_datasets/artists.csv")
+with profiler.stage("load") as stage:
+    tracks = pd.read_csv("../enriched_datasets/tracks_enriched.csv")
+    artists = pd.read_csv("../enriched_datasets/artists.csv")
+    stage["rows_out"] = len(tracks)
 
 
 
@@ -24,6 +49,7 @@ artists = pd.read_csv("../enriched_datasets/artists.csv")
         missing values etc.
     TODO Understand why popularity is not recognised as numeric.
 """
+@profiler.timed()
 def data_filling(tracks, artists):
     tracks = tracks.copy()
     artists = artists.copy()
@@ -68,8 +94,10 @@ def data_filling(tracks, artists):
     2. artist
     3. both
 """
+@profiler.timed()
 def og_tracks_heatmap(numeric_tracks):
-    og_tracks_corr = numeric_tracks.corr()
+    with profiler.stage("og_tracks_corr", rows_in=len(numeric_tracks)):
+        og_tracks_corr = numeric_tracks.corr()
 
     plt.figure(figsize=(14, 12))
     sns.heatmap(og_tracks_corr, cmap="coolwarm", annot=True, fmt=".2f", linewidths=0.5, annot_kws={"size": 8})
@@ -80,8 +108,10 @@ def og_tracks_heatmap(numeric_tracks):
     plt.show()
     return
 
+@profiler.timed()
 def og_artists_heatmap(numeric_artists):
-    og_artists_corr = numeric_artists.corr()
+    with profiler.stage("og_artists_corr", rows_in=len(numeric_artists)):
+        og_artists_corr = numeric_artists.corr()
 
     plt.figure(figsize=(12, 10))
     sns.heatmap(og_artists_corr, cmap="coolwarm", annot=True, fmt=".2f", linewidths=0.5, annot_kws={"size": 8})
@@ -92,10 +122,12 @@ def og_artists_heatmap(numeric_artists):
     plt.show()
     return
 
+@profiler.timed()
 def og_full_heatmap(numeric_tracks, numeric_artists):
     numeric_feats = pd.concat([numeric_tracks, numeric_artists], axis=1)
 
-    og_corr = numeric_feats.corr()
+    with profiler.stage("og_full_corr", rows_in=len(numeric_feats)):
+        og_corr = numeric_feats.corr()
 
     # Print couples of features with high correlation
     print("Couples of features with correlation > 0.30:\n")
@@ -123,15 +155,18 @@ def og_full_heatmap(numeric_tracks, numeric_artists):
 """
     LANGUAGE FEATURES
 """
+@profiler.timed()
 def swear_ratio(tracks):
     tracks["swear_ratio"] = (tracks["swear_IT"] + tracks["swear_EN"])/tracks["n_tokens"]
     return tracks
 
 # Re-evaluate
+@profiler.timed()
 def syntactic_complexity(tracks):
     tracks["syntactic_complexity"] = tracks["tokens_per_sent"] * tracks["avg_token_per_clause"]
     return tracks
 
+@profiler.timed()
 def text_density(tracks):
     tracks["text_density"] = tracks["n_tokens"] / tracks["n_sentences"]
     # check for Nans
@@ -143,18 +178,22 @@ def text_density(tracks):
     SOUND FEATURES
     TODO Check all the math behind it
 """
+@profiler.timed()
 def percussivness(tracks):
     tracks["percussivness"] = tracks["zcr"] * tracks["rolloff"]
     return tracks
 
+@profiler.timed()
 def modulation_index(tracks):
     tracks["modulation_index"] = tracks["flux"] / tracks["pitch"]
     return tracks
 
+@profiler.timed()
 def energy_index(tracks):
     tracks["energy_index"] = (tracks["rms"] + tracks["loudness"])/2
     return tracks
 
+@profiler.timed()
 def norm_energy_index(tracks):
     energy_index = (tracks["rms"] + tracks["loudness"])
 
@@ -163,14 +202,17 @@ def norm_energy_index(tracks):
     tracks["norm_energy_index"] = energy_index / energy_complexity
     return tracks
 
+@profiler.timed()
 def timbre_brightness(tracks):
     tracks["timbre_brightness"] = (tracks["centroid"] + tracks["rolloff"])/2
     return tracks
 
+@profiler.timed()
 def noise_ratio(tracks):
     tracks["noise_ratio"] = tracks["zcr"] * tracks["flatness"]
     return tracks
 
+@profiler.timed()
 def rythmic_complexity(tracks):
     tracks["rythmic_complexity"] = tracks["bpm"] * tracks["flux"]
     return tracks
@@ -180,6 +222,7 @@ def rythmic_complexity(tracks):
 """
     POPULARITY FEATURES
 """
+@profiler.timed()
 def relative_popularity(tracks):
     # Mean popularity per artist
     artist_pop_mean = tracks.groupby("id_artist")["popularity"].transform("mean")
@@ -195,6 +238,7 @@ def relative_popularity(tracks):
 """
     Creating a new dataframe with both old and new features.
 """
+@profiler.timed()
 def create_df(tracks: pd.DataFrame) -> pd.DataFrame:
     tracks = swear_ratio(tracks)
     tracks = syntactic_complexity(tracks)
@@ -227,5 +271,17 @@ if __name__ == "__main__":
 #
     #print(f"File saved in: {output_path}")
 
+    # Exports the selected features as an imputed (and optionally standardized) float32 memmap,
+    # column names and scaling parameters go in the .json sidecar, track ids in <stem>_ids.npy.
+    # Open it in the modeling tasks with utils.feature_matrix.load_feature_matrix
+    if EXPORT_FEATURE_MATRIX:
+        with profiler.stage("export_feature_matrix", rows_in=len(tracks_new_features)):
+            export_feature_matrix(tracks_new_features, EXPORT_PATH, columns=EXPORT_FEATURES,
+                                  id_column="id", impute="median", standardize=EXPORT_STANDARDIZE)
+
+    # Wall/CPU time, peak memory and row counts of each stage,
+    # run with PROFILE_DIR=<dir> to also get a cProfile trace per stage
+    profiler.dump("../profiling/feature_extraction_run.json")
+
 
 
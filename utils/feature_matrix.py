@@ -0,0 +1,121 @@
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# rows written to the memmap per block, keeps the float32 temporary copy small
+CHUNK_ROWS = 100_000
+
+
+
+"""
+    Returns the sidecar path of a feature matrix, e.g.
+    tracks_features.npy -> tracks_features.json
+"""
+def _sidecar_path(path):
+    return Path(path).with_suffix(".json")
+
+"""
+    Returns the row IDs path of a feature matrix, e.g.
+    tracks_features.npy -> tracks_features_ids.npy
+"""
+def _ids_path(path):
+    path = Path(path)
+    return path.with_name(f"{path.stem}_ids.npy")
+
+"""
+    Computes the per-column imputation values and, when standardize=True,
+    the mean and std used for the z-score scaling (computed after imputation).
+    Infinite values (e.g. ratios with a zero denominator) are treated as missing.
+"""
+def _fit_params(df, columns, impute, standardize):
+    params = {"impute": impute, "fill": {}, "standardize": standardize, "mean": {}, "std": {}}
+    for col in columns:
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan, copy=True)
+        values[np.isinf(values)] = np.nan
+
+        if impute == "median":
+            fill = np.nanmedian(values) if not np.isnan(values).all() else 0.0
+        elif impute == "mean":
+            fill = np.nanmean(values) if not np.isnan(values).all() else 0.0
+        else:
+            fill = float(impute)
+        params["fill"][col] = float(fill)
+
+        if standardize:
+            values[np.isnan(values)] = fill
+            std = values.std()
+            params["mean"][col] = float(values.mean())
+            params["std"][col] = float(std) if std > 0 else 1.0
+    return params
+
+
+
+"""
+    Writes the selected features as a contiguous (C-order) float32 .npy memmap,
+    ready to be opened zero-copy by the modeling tasks.
+    - impute -> "median", "mean" or a constant used in place of NaN/inf
+    - standardize -> z-score each column with the mean/std of the imputed data
+    - id_column -> column saved as row IDs (e.g. the track id), it can't
+      contain missing values; the index is used when the column is absent
+    The sidecar .json next to the matrix only holds small metadata: shape,
+    column names and the imputation/scaling parameters to apply the same
+    transform to new data. The row IDs go in <stem>_ids.npy as a fixed-width
+    string array, so they can be memory-mapped as well.
+"""
+def export_feature_matrix(df, output_path, columns=None, id_column="id", impute="median", standardize=False):
+    if columns is None:
+        columns = [col for col in df.select_dtypes(include=["number", "bool"]).columns if col != id_column]
+    columns = list(columns)
+    # astype(str) would turn missing ids into "nan", and several of them would join as one key downstream
+    if id_column in df.columns and df[id_column].isna().any():
+        raise ValueError(f"{df[id_column].isna().sum()} rows have a missing '{id_column}', drop or fill them before the export")
+    params = _fit_params(df, columns, impute, standardize)
+
+    fill = np.array([params["fill"][col] for col in columns], dtype="float64")
+    mean = np.array([params["mean"].get(col, 0.0) for col in columns], dtype="float64")
+    std = np.array([params["std"].get(col, 1.0) for col in columns], dtype="float64")
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    matrix = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float32, shape=(len(df), len(columns)))
+
+    for start in range(0, len(df), CHUNK_ROWS):
+        block = df.iloc[start:start + CHUNK_ROWS][columns].apply(pd.to_numeric, errors="coerce")
+        block = block.to_numpy(dtype="float64", na_value=np.nan)
+        block = np.where(np.isfinite(block), block, fill)
+        if standardize:
+            block = (block - mean) / std
+        matrix[start:start + len(block)] = block
+    matrix.flush()
+    del matrix
+
+    row_ids = df[id_column] if id_column in df.columns else df.index.to_series()
+    np.save(_ids_path(output_path), row_ids.astype(str).to_numpy(dtype=str))
+
+    sidecar = {
+        "shape": [len(df), len(columns)],
+        "dtype": "float32",
+        "columns": columns,
+        "id_column": id_column,
+        "scaling": params,
+    }
+    with open(_sidecar_path(output_path), "w") as f:
+        json.dump(sidecar, f)
+
+    print(f"Feature matrix {len(df)}x{len(columns)} saved in: {output_path}")
+    return output_path
+
+"""
+    Opens a feature matrix written by export_feature_matrix without loading it.
+    Returns the read-only memmap and the sidecar metadata, with the row IDs
+    memory-mapped in meta["row_ids"]; slicing the memmaps (e.g. matrix[1000:2000])
+    only reads those rows from disk, and several worker processes can open
+    the same files sharing the OS page cache.
+"""
+def load_feature_matrix(path, mmap_mode="r"):
+    matrix = np.load(path, mmap_mode=mmap_mode)
+    with open(_sidecar_path(path)) as f:
+        meta = json.load(f)
+    meta["row_ids"] = np.load(_ids_path(path), mmap_mode=mmap_mode)
+    return matrix, meta
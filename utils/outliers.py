@@ -0,0 +1,213 @@
+import pandas as pd
+import numpy as np
+from scipy.stats import chi2
+
+# audio descriptors available in the tracks dataset, used by the multivariate detector
+AUDIO_FEATURES = ["rms", "loudness", "flux", "zcr", "centroid", "rolloff", "flatness", "spectral_complexity", "pitch", "bpm"]
+
+# 1.4826 makes the MAD a consistent estimator of the std dev for normal data
+MAD_SCALE = 1.4826
+# same for the mean absolute deviation, used when the MAD is 0 (Iglewicz-Hoaglin)
+MEAN_AD_SCALE = 1.2533
+# minimum z-score scale / IQR of integer-valued columns, so that in a mostly-zero count column a single unit isn't an outlier
+MIN_COUNT_SCALE = 1.0
+
+
+
+"""
+    Returns the values of the given columns as a float64 numpy array, filled
+    column by column to avoid a full frame copy.
+    Nullable pandas dtypes (Int64, boolean) are converted with NaN in place of pd.NA.
+"""
+def _to_float_array(df, columns):
+    values = np.empty((len(df), len(columns)), dtype="float64")
+    for j, col in enumerate(columns):
+        values[:, j] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return values
+
+"""
+    Maps the group column to integer codes once, so the group statistics are
+    computed on ints and broadcast back with a take instead of a join.
+"""
+def _group_codes(df, group):
+    if group is None:
+        return None, 0
+    codes, uniques = pd.factorize(df[group])
+    return codes, len(uniques)
+
+"""
+    Broadcasts a per-group statistic table back to the rows.
+    Rows with a missing group (code -1) get NaN.
+"""
+def _broadcast(per_group, codes, n_groups):
+    per_group = per_group[per_group.index >= 0]
+    # one extra NaN row so that code -1 indexes a missing statistic
+    table = np.full((n_groups + 1, per_group.shape[1]), np.nan)
+    table[per_group.index.to_numpy()] = per_group.to_numpy(dtype="float64")
+    return table[codes]
+
+"""
+    Computes the quartiles (Q1, median, Q3) of each column in a single pass.
+    - codes=None -> one value per column, shape (1, n_columns)
+    - codes=<group codes> -> the quartiles of the row's group (e.g. the artist),
+      shape (n_rows, n_columns)
+"""
+def _quartiles(values, codes, n_groups):
+    if codes is None:
+        return tuple(np.nanquantile(values, [0.25, 0.5, 0.75], axis=0)[:, None, :])
+
+    per_group = pd.DataFrame(values).groupby(codes, sort=True).quantile([0.25, 0.5, 0.75])
+    return tuple(_broadcast(per_group.xs(q, level=1), codes, n_groups) for q in (0.25, 0.5, 0.75))
+
+"""
+    Median and mean of the absolute deviations, globally or per group.
+"""
+def _abs_dev_stats(abs_dev, codes, n_groups):
+    if codes is None:
+        return np.nanmedian(abs_dev, axis=0, keepdims=True), np.nanmean(abs_dev, axis=0, keepdims=True)
+
+    grouped = pd.DataFrame(abs_dev).groupby(codes, sort=True)
+    return _broadcast(grouped.median(), codes, n_groups), _broadcast(grouped.mean(), codes, n_groups)
+
+
+
+"""
+    True for the columns holding only integer values (NaN aside), e.g. swear counts.
+"""
+def _is_count(values):
+    return np.all(np.isnan(values) | (values == np.round(values)), axis=0)
+
+"""
+    Modified z-score on precomputed arrays, see robust_zscore_flags.
+"""
+def _robust_zscore(values, median, codes, n_groups, threshold):
+    abs_dev = np.abs(values - median)
+    mad, mean_ad = _abs_dev_stats(abs_dev, codes, n_groups)
+    # zero-inflated columns (e.g. swear counts) have MAD = 0, fall back to the mean absolute deviation
+    scale = np.where(mad > 0, mad * MAD_SCALE, mean_ad * MEAN_AD_SCALE)
+    # with a median of 0 the mean absolute deviation is the column mean, e.g. 0.1 for sparse swear counts,
+    # which would make every non-zero count an outlier
+    scale = np.where(_is_count(values), np.maximum(scale, MIN_COUNT_SCALE), scale)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = abs_dev / scale
+    return (z > threshold) & (scale > 0)
+
+"""
+    Tukey IQR rule on precomputed quartiles, see iqr_flags.
+"""
+def _iqr(values, q1, q3, k):
+    iqr = q3 - q1
+    # same floor as the z-score for counts, small groups give interpolated quartiles like Q3 = 0.25
+    fence = np.where(_is_count(values), np.maximum(iqr, MIN_COUNT_SCALE), iqr)
+    flags = (values < q1 - k * fence) | (values > q3 + k * fence)
+    return flags & (iqr > 0)
+
+
+
+"""
+    Robust (modified) z-score rule: |x - median| / (1.4826 * MAD) > threshold.
+    When the MAD is 0, as for zero-inflated counts where most values are 0,
+    the scale falls back to 1.2533 * mean absolute deviation (Iglewicz-Hoaglin).
+    Integer-valued columns use a scale of at least 1, so a sparse count column
+    with median 0 only flags counts above the threshold (e.g. 4+ swear words).
+    Rows with NaN, or whose column/group is constant, are never flagged.
+"""
+def robust_zscore_flags(df, columns, threshold=3.5, group=None):
+    values = _to_float_array(df, columns)
+    codes, n_groups = _group_codes(df, group)
+    _, median, _ = _quartiles(values, codes, n_groups)
+    flags = _robust_zscore(values, median, codes, n_groups, threshold)
+
+    suffix = "rz" if group is None else f"rz_{group}"
+    return pd.DataFrame(flags, columns=[f"{col}_{suffix}" for col in columns], index=df.index)
+
+"""
+    Tukey IQR rule: x < Q1 - k*IQR or x > Q3 + k*IQR.
+    The rule is skipped when the IQR is 0 (e.g. Q1 = Q3 = 0 for zero-inflated
+    counts), otherwise every value different from Q3 would be flagged, and
+    integer-valued columns use an IQR of at least 1 for the fences.
+    Rows with NaN are never flagged.
+"""
+def iqr_flags(df, columns, k=1.5, group=None):
+    values = _to_float_array(df, columns)
+    codes, n_groups = _group_codes(df, group)
+    q1, _, q3 = _quartiles(values, codes, n_groups)
+    flags = _iqr(values, q1, q3, k)
+
+    suffix = "iqr" if group is None else f"iqr_{group}"
+    return pd.DataFrame(flags, columns=[f"{col}_{suffix}" for col in columns], index=df.index)
+
+"""
+    Flags values outside a known valid domain, e.g. popularity in [0, 100]
+    or an artist career starting before birth.
+    bounds = {column: (low, high)}, use None for an open side.
+"""
+def range_flags(df, bounds):
+    flags = {}
+    for col, (low, high) in bounds.items():
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        flag = np.zeros(len(values), dtype=bool)
+        if low is not None:
+            flag |= values < low
+        if high is not None:
+            flag |= values > high
+        flags[f"{col}_range"] = flag
+    return pd.DataFrame(flags, index=df.index)
+
+"""
+    Multivariate detector: squared Mahalanobis distance of each row from the
+    feature mean, flagged when above the chi2 quantile with len(columns) dof.
+    Features are standardized first since they live on very different scales
+    (e.g. zcr vs centroid). Rows with any NaN feature are not flagged.
+"""
+def mahalanobis_flags(df, columns=AUDIO_FEATURES, quantile=0.999):
+    columns = [col for col in columns if col in df.columns]
+    values = _to_float_array(df, columns)
+    complete = ~np.isnan(values).any(axis=1)
+
+    flags = np.zeros(len(values), dtype=bool)
+    if complete.sum() > len(columns):
+        x = values[complete]
+        x = (x - x.mean(axis=0)) / x.std(axis=0)
+        x = np.nan_to_num(x)  # constant columns
+        inv_cov = np.linalg.pinv(np.cov(x, rowvar=False))
+        d2 = ((x @ inv_cov) * x).sum(axis=1)
+        flags[complete] = d2 > chi2.ppf(quantile, df=len(columns))
+
+    return pd.DataFrame({"mahalanobis": flags}, index=df.index)
+
+
+
+"""
+    Runs all the detection rules and returns a boolean flag matrix with the
+    same index of df, one column per (feature, rule), no copy of the data.
+    The columns are converted to float and the group is factorized only once,
+    and the quartiles are shared by the z-score and IQR rules.
+    Use flags.any(axis=1) to get the rows with at least one anomaly, or
+    flags.sum() for a per-rule count.
+"""
+def detect_outliers(df, columns, group=None, bounds=None, multivariate_columns=None,
+                    z_threshold=3.5, iqr_k=1.5, quantile=0.999):
+    columns = [col for col in columns if col in df.columns]
+    values = _to_float_array(df, columns)
+
+    scopes = [(None, 0, "")]
+    if group is not None:
+        codes, n_groups = _group_codes(df, group)
+        scopes.append((codes, n_groups, f"_{group}"))
+
+    blocks, names = [], []
+    for codes, n_groups, suffix in scopes:
+        q1, median, q3 = _quartiles(values, codes, n_groups)
+        blocks.append(_robust_zscore(values, median, codes, n_groups, z_threshold))
+        names += [f"{col}_rz{suffix}" for col in columns]
+        blocks.append(_iqr(values, q1, q3, iqr_k))
+        names += [f"{col}_iqr{suffix}" for col in columns]
+
+    parts = [pd.DataFrame(np.hstack(blocks), columns=names, index=df.index)]
+    if bounds:
+        parts.append(range_flags(df, bounds))
+    if multivariate_columns:
+        parts.append(mahalanobis_flags(df, multivariate_columns, quantile=quantile))
+    return pd.concat(parts, axis=1)
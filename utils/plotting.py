@@ -3,6 +3,9 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from utils.profiling import profiler
+
+@profiler.timed(label_arg="title")
 def plot_nans_stacked(df, title):
     nan_count = df.isnull().sum()
     nan_pct = (nan_count / len(df)) * 100
@@ -30,6 +33,7 @@ def plot_nans_stacked(df, title):
     plt.tight_layout()
     plt.show()
     
+@profiler.timed(label_arg="title")
 def plot_bar_chart_distribution(df, col_to_plot, xlabel, ylabel, title):
 
     plot_data = df[col_to_plot].value_counts().head(10)
@@ -43,6 +47,7 @@ def plot_bar_chart_distribution(df, col_to_plot, xlabel, ylabel, title):
     plt.tight_layout()
     plt.show()
     
+@profiler.timed(label_arg="title")
 def plot_scatter(df, x_col, y_col, xlabel, ylabel, title):
     plt.figure(figsize=(12, 6))
     plt.scatter(df[x_col], df[y_col])
@@ -53,6 +58,7 @@ def plot_scatter(df, x_col, y_col, xlabel, ylabel, title):
     plt.tight_layout()
     plt.show()
     
+@profiler.timed(label_arg="title")
 def plot_histogram(df, column, xlabel, ylabel, title, nbins):
     plt.figure(figsize=(12, 6))
     plt.hist(df[column].dropna(), bins=nbins)
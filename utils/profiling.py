@@ -0,0 +1,286 @@
+import cProfile
+import inspect
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows, the run peak RSS is reported as None
+    resource = None
+
+# upper bounds (seconds) of the API latency histogram buckets, the last bucket is open
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+# seconds between two RSS samples of the background sampler
+RSS_SAMPLE_INTERVAL = 0.005
+
+
+
+"""
+    Returns the peak resident set size of the whole process in MB, it never
+    goes down so it is only reported in the run summary, not per stage.
+    ru_maxrss is in KB on Linux and in bytes on macOS.
+"""
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / 1024 ** 2
+    return peak / 1024
+
+"""
+    Default memory meter: a background thread samples the current RSS from
+    /proc/self/statm (Linux only) and keeps the highest value seen since the
+    last reset_peak(). Reading a few bytes every 5 ms costs next to nothing,
+    so the timings of the stages are not affected.
+"""
+class _RssSampler:
+    name = "rss"
+
+    def __init__(self):
+        self._fd = os.open("/proc/self/statm", os.O_RDONLY)
+        self._page = os.sysconf("SC_PAGE_SIZE")
+        self._peak = self._current()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def available():
+        return os.path.exists("/proc/self/statm")
+
+    def _current(self):
+        # pread doesn't move the file offset, so the two threads can read concurrently
+        return int(os.pread(self._fd, 128, 0).split()[1]) * self._page
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self._peak = max(self._peak, self._current())
+
+    def get(self):
+        current = self._current()
+        self._peak = max(self._peak, current)
+        return current, self._peak
+
+    def reset_peak(self):
+        self._peak = self._current()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        os.close(self._fd)
+
+"""
+    Opt-in memory meter (PROFILE_MEMORY=1): tracemalloc traces every Python
+    and numpy/pandas allocation, more precise than the RSS but it slows the
+    code down several times, so the timings of a traced run are not reliable.
+"""
+class _TracemallocMeter:
+    name = "tracemalloc"
+
+    def __init__(self):
+        tracemalloc.start()
+
+    @staticmethod
+    def available():
+        return True
+
+    def get(self):
+        return tracemalloc.get_traced_memory()
+
+    def reset_peak(self):
+        tracemalloc.reset_peak()
+
+    def stop(self):
+        tracemalloc.stop()
+
+"""
+    Number of rows of a DataFrame/Series/array-like, None for anything else.
+"""
+def _n_rows(obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, tuple):
+        rows = [_n_rows(o) for o in obj]
+        rows = [r for r in rows if r is not None]
+        return rows[0] if rows else None
+    return None
+
+
+
+"""
+    Collects timing and memory statistics for each stage of a run.
+    - stage(name) -> context manager recording wall time, CPU time, memory
+      and row counts of a block of code. Memory is measured on the stage alone:
+      peak_mb is the peak during this stage, peak_growth_mb how much it went
+      above the memory in use when the stage started, net_mb what the stage
+      left allocated. By default it is the process RSS sampled by a background
+      thread, with trace_memory=True it is the memory traced by tracemalloc.
+      The meter only runs while a stage is open.
+    - timed(name, label_arg) -> same thing as a function decorator, rows are
+      taken from the first DataFrame argument and from the returned value,
+      label_arg names an argument appended to the stage name
+    - record_request(...) -> latency, status code and retries of an API call
+    - dump(path) -> writes the run summary as JSON
+    When profile_dir is set, each stage is also run under cProfile and the
+    stats are saved as <profile_dir>/<stage>_<call>.prof (open them with snakeviz,
+    or convert to a flamegraph with flameprof).
+    Stages called several times (e.g. a plot function) are aggregated.
+"""
+class RunProfiler:
+    def __init__(self, profile_dir=None, trace_memory=False):
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self._meter_type = _TracemallocMeter if trace_memory else _RssSampler
+        self._meter = None
+        self.stages = {}
+        self.requests = {}
+        self._profiling = False
+        # peak memory of each running stage, saved before an inner stage resets the meter peak
+        self._peaks = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        info = {"rows_out": None}
+        profile = None
+        if self.profile_dir is not None and not self._profiling:
+            # cProfile can't be nested, inner stages are part of the outer profile
+            profile = cProfile.Profile()
+            self._profiling = True
+            profile.enable()
+
+        if not self._peaks and self._meter_type.available():
+            # outermost stage, the meter is stopped again when it exits
+            self._meter = self._meter_type()
+        mem_start, mem_peak = self._meter.get() if self._meter else (0, 0)
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], mem_peak)
+        self._peaks.append(mem_start)
+        if self._meter:
+            self._meter.reset_peak()
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield info
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            memory = None
+            if self._meter:
+                mem_end, mem_peak = self._meter.get()
+                mem_peak = max(self._peaks[-1], mem_peak)
+                memory = {"peak": mem_peak, "growth": mem_peak - mem_start, "net": mem_end - mem_start}
+            self._peaks.pop()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], memory["peak"] if memory else 0)
+            elif self._meter:
+                self._meter.stop()
+                self._meter = None
+            if profile is not None:
+                profile.disable()
+                self._profiling = False
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                call = self.stages.get(name, {}).get("calls", 0)
+                file_name = re.sub(r"[^\w.-]+", "_", name)
+                profile.dump_stats(self.profile_dir / f"{file_name}_{call}.prof")
+            self._add_stage(name, wall, cpu, memory, rows_in, info["rows_out"])
+
+    def timed(self, name=None, label_arg=None):
+        def decorator(func):
+            stage_name = name or func.__name__
+            signature = inspect.signature(func)
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                full_name = stage_name
+                if label_arg is not None:
+                    # e.g. one stage per plot title instead of one per plot function
+                    full_name = f"{stage_name}[{signature.bind(*args, **kwargs).arguments.get(label_arg)}]"
+                rows_in = next((_n_rows(a) for a in args if _n_rows(a) is not None), None)
+                with self.stage(full_name, rows_in=rows_in) as info:
+                    result = func(*args, **kwargs)
+                    info["rows_out"] = _n_rows(result)
+                return result
+            return wrapper
+        return decorator
+
+    def _add_stage(self, name, wall, cpu, memory, rows_in, rows_out):
+        s = self.stages.setdefault(name, {
+            "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "max_wall_s": 0.0,
+            "peak_mb": None, "peak_growth_mb": None, "net_mb": None, "rows_in": None, "rows_out": None,
+        })
+        s["calls"] += 1
+        s["wall_s"] += wall
+        s["cpu_s"] += cpu
+        s["max_wall_s"] = max(s["max_wall_s"], wall)
+        if memory is not None:
+            s["peak_mb"] = max(s["peak_mb"] or 0.0, memory["peak"] / 1024 ** 2)
+            s["peak_growth_mb"] = max(s["peak_growth_mb"] or 0.0, memory["growth"] / 1024 ** 2)
+            s["net_mb"] = (s["net_mb"] or 0.0) + memory["net"] / 1024 ** 2
+        if rows_in is not None:
+            s["rows_in"] = rows_in
+        if rows_out is not None:
+            s["rows_out"] = rows_out
+
+    """
+        Records one API call attempt: latency in seconds, HTTP status
+        (None for a timeout or network error) and retries=1 when the
+        attempt is a retry of a failed one.
+    """
+    def record_request(self, name, latency, status=None, retries=0):
+        r = self.requests.setdefault(name, {
+            "calls": 0, "total_s": 0.0, "max_s": 0.0, "retries": 0, "errors": 0,
+            "status": defaultdict(int), "histogram": [0] * (len(LATENCY_BUCKETS) + 1),
+        })
+        r["calls"] += 1
+        r["total_s"] += latency
+        r["max_s"] = max(r["max_s"], latency)
+        r["retries"] += retries
+        r["status"][str(status)] += 1
+        if status is None or status >= 400:
+            r["errors"] += 1
+        bucket = next((i for i, b in enumerate(LATENCY_BUCKETS) if latency <= b), len(LATENCY_BUCKETS))
+        r["histogram"][bucket] += 1
+
+    def summary(self):
+        requests = {}
+        for name, r in self.requests.items():
+            requests[name] = {
+                **r,
+                "mean_s": r["total_s"] / r["calls"],
+                "status": dict(r["status"]),
+                "rate_limited_429": r["status"].get("429", 0),
+                "histogram": dict(zip([f"<={b}s" for b in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"], r["histogram"])),
+            }
+        return {
+            "script": Path(sys.argv[0]).name,
+            "total_wall_s": time.perf_counter() - self._start,
+            "peak_rss_mb": peak_rss_mb(),
+            "stage_memory": self._meter_type.name if self._meter_type.available() else None,
+            "stages": self.stages,
+            "requests": requests,
+        }
+
+    def dump(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        print(f"Run summary saved in: {path}")
+        return path
+
+
+
+# shared profiler used by the task scripts, set PROFILE_DIR to also save a cProfile trace per stage
+# and PROFILE_MEMORY=1 to measure the stage memory with tracemalloc instead of the RSS (much slower)
+profiler = RunProfiler(profile_dir=os.getenv("PROFILE_DIR"), trace_memory=bool(os.getenv("PROFILE_MEMORY")))